@@ -6,19 +6,207 @@ Documentation: https://tracker.gg/developers/docs/titles/splitgate
 """
 
 import requests
-import urllib
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
+from importlib.util import find_spec
 from os import getenv
+from threading import Lock
+from time import monotonic
+from types import MappingProxyType
+
+try:
+    from orjson import loads as _loads
+except ImportError:
+    from json import loads as _loads
+
+try:
+    import aiohttp
+except ImportError:  # aiohttp is only needed by AsyncClient
+    aiohttp = None
+
+# Only advertise Brotli when a decoder is installed, otherwise responses couldn't be decompressed
+if find_spec("brotli") or find_spec("brotlicffi"):
+    ACCEPT_ENCODING = "br, gzip, deflate"
+else:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+_SEARCH_URL = "https://public-api.tracker.gg/v2/splitgate/standard/search"
+_PROFILE_URL_TPL = "https://public-api.tracker.gg/v2/splitgate/standard/profile/{}/{}"
+_HEADER_TEMPLATE = MappingProxyType({"Accept": "application/json", "Accept-Encoding": ACCEPT_ENCODING})
+
+
+def get_platform_info(response: dict):
+    """
+    Return the user's platform informations
+
+    :param response: The dict returned by `get_player_stats()`
+
+    :rtype: dict
+    """
+
+    platform_info = response["data"]["platformInfo"]
+    return {
+        "platformSlug": platform_info["platformSlug"],
+        "platformUserId": platform_info["platformUserId"],
+        "platformUserHandle": platform_info["platformUserHandle"],
+        "platformUserIdentifier": platform_info["platformUserIdentifier"],
+        "avatarUrl": platform_info["avatarUrl"],
+        "additionalParameters": platform_info["additionalParameters"]
+    }
+
+
+def get_user_info(response: dict):
+    """
+    Return the user's profile informations 
+
+    :param response: The dict returned by `get_player_stats()`
+
+    :rtype: dict
+    """
+
+    user_info = response["data"]["userInfo"]
+    return {
+        "userId": user_info["userId"],
+        "isPremium": user_info["isPremium"],
+        "isVerified": user_info["isVerified"],
+        "isInfluencer": user_info["isInfluencer"],
+        "isPartner": user_info["isPartner"],
+        "countryCode": user_info["countryCode"],
+        "customAvatarUrl": user_info["customAvatarUrl"],
+        "customHeroUrl": user_info["customHeroUrl"],
+        "socialAccounts": list(user_info["socialAccounts"]), # platformSlug, platformUserHandle, platformUserIdentifier
+        "pageviews": user_info["pageviews"],
+        "isSuspicious": user_info["isSuspicious"]
+    }
+
+
+def get_user_field(response: dict, field: str):
+    """
+    Return a single field of the user's profile informations, without building the whole dict
+
+    :param response: The dict returned by `get_player_stats()`
+    :param field: One of the keys returned by `get_user_info()`
+    """
+
+    return response["data"]["userInfo"][field]
+
+
+def get_user_stat(response: dict, stat: str):
+    """
+    Return the user statistic
+
+    :param response: The dict returned by `get_player_stats()`
+    :param stat: The stat you are looking for (see the documentation for more informations)
+
+    :rtype: dict
+    """
+
+    statistic = response["data"]["segments"][0]["stats"][stat]
+    return {
+        "rank": statistic["rank"],
+        "percentile": statistic["percentile"],
+        "displayName": statistic["displayName"],
+        "displayCategory": statistic["displayCategory"],
+        "category": statistic["category"],
+        "metadata": statistic["metadata"], # can contain extra data such as an image url
+        "value": statistic["value"],
+        "displayValue": statistic["displayValue"],
+        "displayType": statistic["displayType"]
+    }
+
+
+class TTLCache():
+    """A small bounded, thread-safe cache whose entries expire `ttl` seconds after being stored"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = {}
+        self._lock = Lock()
+
+    def get(self, key):
+        """ Return the cached value, or None if it is missing or expired """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            if len(self._data) >= self.maxsize and key not in self._data:
+                del self._data[next(iter(self._data))] # evict the oldest entry
+            self._data[key] = (monotonic() + self.ttl, value)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
 
 class Client():
     """Perform requests to Tracker.gg's API services"""
 
-    def __init__(self, API_KEY: str):
+    __slots__ = ("API_KEY", "headers", "session", "_search_url", "_profile_url_tpl", "_cache", "_pool_maxsize")
+
+    def __init__(self, API_KEY: str, cache_ttl: float = 60, pool_maxsize: int = 20):
         """
         :param API_KEY: the API key provided by Tracker.gg during the
         creation of your application (you MUST not share it with anyone)
+        :param cache_ttl: seconds a successful response is reused before asking the API again (0 disables caching).
+        The raw body is cached and decoded on every hit, so callers never share the returned dicts
+        :param pool_maxsize: number of keep-alive connections kept open, it also caps the threads
+        used by `get_player_stats_many()`
         """
         self.API_KEY = API_KEY
-        self.headers = self.get_headers()
+        self.headers = {**_HEADER_TEMPLATE, "TRN-API-Key": API_KEY}
+        self._search_url = _SEARCH_URL
+        self._profile_url_tpl = _PROFILE_URL_TPL
+        self._cache = TTLCache(ttl=cache_ttl) if cache_ttl > 0 else None
+        self._pool_maxsize = pool_maxsize
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        # Retry rate limits and transient server errors with backoff (honouring `Retry-After`),
+        # then hand the last status code back to the caller as usual
+        retries = Retry(total=3, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504),
+                        allowed_methods=frozenset(["GET"]), raise_on_status=False)
+        self.session.mount("https://", HTTPAdapter(max_retries=retries, pool_connections=10, pool_maxsize=pool_maxsize))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Close the underlying session and its pooled connections"""
+        self.session.close()
+
+    def invalidate(self, platform: str = None, user_identifier: str = None):
+        """
+        Drop cached responses: the profile of the given player, or everything (searches included)
+        if called without arguments
+
+        :param platform: The platform slug (`steam`, `xbl`, `psn`)
+        :param user_identifier: The user's handle on the platform
+        """
+        if (platform is None) != (user_identifier is None):
+            raise TypeError("invalidate() needs both platform and user_identifier, or neither")
+        if self._cache is None:
+            return
+        if platform is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(("profile", platform, str(user_identifier)))
 
     def get_api_key(self):
         """ :rtype: string """
@@ -26,15 +214,12 @@ class Client():
 
     def get_headers(self):
         """
-        Providing your API key, the header proves that your application is registered
-        
+        Providing your API key, the header proves that your application is registered.
+        Changing the returned copy doesn't affect the headers sent by the client
+
         :rtype: dict
         """
-        return { 
-            "TRN-API-Key": self.API_KEY,
-            "Accept": "application/json",
-            "Accept-Encoding": "gzip"
-        }
+        return dict(self.headers)
 
     def search_player(self, platform: str, query: dict):
         """
@@ -46,12 +231,40 @@ class Client():
         :rtype: dict / int
         """
 
-        query = urllib.urlencode(query)
-        response = requests.get("https://public-api.tracker.gg/v2/splitgate/standard/search?{query}", headers=self.headers)
-        if response.status_code in range(200, 299):
-            return response.json()
+        key = None
+        if self._cache is not None:
+            try:
+                key = ("search", platform, frozenset(query.items()))
+            except TypeError: # unhashable values (ex: lists) are sent but not cached
+                key = None
+            else:
+                cached = self._cache.get(key)
+                if cached is not None:
+                    return _loads(cached)
+
+        response = self.session.get(self._search_url, params=query)
+        status = response.status_code
+        if 200 <= status < 300:
+            if key is not None:
+                self._cache.set(key, response.content)
+            return _loads(response.content)
         else:
-            return response.status_code
+            return status
+
+    def get_player_stats_raw(self, platform: str, user_identifier: str):
+        """
+        Same as `get_player_stats()`, but return the undecoded JSON body so it can be
+        stored or forwarded without a decode/encode round trip (responses are not cached)
+
+        :rtype: bytes / int
+        """
+
+        response = self.session.get(self._profile_url_tpl.format(platform, quote(str(user_identifier), safe="")))
+        status = response.status_code
+        if 200 <= status < 300:
+            return response.content
+        else:
+            return status
 
     def get_player_stats(self, platform: str, user_identifier: str):
         """
@@ -64,74 +277,100 @@ class Client():
         :rtype: dict / int
         """
 
-        response = requests.get(f"https://public-api.tracker.gg/v2/splitgate/standard/profile/{platform}/{user_identifier}", headers=self.headers)
-        if response.status_code in range(200, 300):
-            return response.json()
-        else:
-            return response.status_code
-
-        def get_platform_info(self, response: dict):
-            """
-            Return the user's platform informations
+        key = ("profile", platform, str(user_identifier))
+        if self._cache is not None:
+            cached = self._cache.get(key)
+            if cached is not None:
+                return _loads(cached)
 
-            :param response: The dict returned by `get_player_stats()`
+        raw = self.get_player_stats_raw(platform, user_identifier)
+        if isinstance(raw, int):
+            return raw
+        if self._cache is not None:
+            self._cache.set(key, raw)
+        return _loads(raw)
 
-            :rtype: dict
-            """
-            
-            platform_info = response["data"]["platformInfo"]
-            return {
-                "plaftormSlug": platform_info["plaftormSlug"],
-                "platformUserId": platform_info["plaftormUserId"],
-                "plaftormUserHandle": platform_info["plaftormUserHandle"],
-                "platformUserIdentifier": platform_info["platformUserIdentifier"],
-                "avatarUrl": platform_info["avatarUrl"],
-                "additionalParameters": platform_info["additionalParameters"]
-            }
+    def get_player_stats_many(self, pairs: list, max_workers: int = 16):
+        """
+        Fetch several profiles in parallel threads sharing the client's pooled connections
+        :param pairs: a list of `(platform, user_identifier)` tuples
+        :param max_workers: the maximum number of concurrent requests, capped to the client's `pool_maxsize`
+        so that every thread reuses a pooled keep-alive connection
 
-    def get_user_info(self, response: dict):
+        :rtype: list of dict / int, in the same order as `pairs`
         """
-        Return the user's profile informations 
 
-        :param response: The dict returned by `get_player_stats()`
+        with ThreadPoolExecutor(max_workers=min(max_workers, self._pool_maxsize)) as executor:
+            return list(executor.map(lambda pair: self.get_player_stats(*pair), pairs))
 
-        :rtype: dict
+    # The response helpers live at module level, these aliases keep `client.get_user_info(response)` working
+    get_platform_info = staticmethod(get_platform_info)
+    get_user_info = staticmethod(get_user_info)
+    get_user_field = staticmethod(get_user_field)
+    get_user_stat = staticmethod(get_user_stat)
+
+
+class AsyncClient():
+    """Perform concurrent requests to Tracker.gg's API services (requires `aiohttp`)
+
+    Use it as an async context manager so a single session is shared by every request:
+    `async with AsyncClient(API_KEY) as client: await client.get_player_stats("steam", "...")`
+    """
+
+    __slots__ = ("API_KEY", "headers", "_search_url", "_profile_url_tpl", "_session")
+
+    def __init__(self, API_KEY: str):
+        """
+        :param API_KEY: the API key provided by Tracker.gg during the
+        creation of your application (you MUST not share it with anyone)
         """
+        if aiohttp is None:
+            raise ImportError("AsyncClient requires the `aiohttp` package")
+        self.API_KEY = API_KEY
+        self.headers = {**_HEADER_TEMPLATE, "TRN-API-Key": API_KEY}
+        self._search_url = _SEARCH_URL
+        self._profile_url_tpl = _PROFILE_URL_TPL
+        self._session = None
+
+    get_api_key = Client.get_api_key
+    get_headers = Client.get_headers
+
+    async def __aenter__(self):
+        self._session = aiohttp.ClientSession(headers=self.get_headers())
+        return self
 
-        user_info = response["data"]["userInfo"]
-        return {
-            "userId": user_info["userId"],
-            "isPremium": user_info["isPremium"],
-            "isVerified": user_info["isVerified"],
-            "isInfluencer": user_info["isInfluencer"],
-            "isPartner": user_info["isPartner"],
-            "countryCode": user_info["countryCode"],
-            "customAvatarUrl": user_info["customAvatarUrl"],
-            "customHeroUrl": user_info["customHeroUrl"],
-            "socialAccounts": [x for x in user_info["socialAccounts"]], # platformSlug, platformUserHandle, platformUserIdentifier
-            "pageviews": user_info["pageviews"],
-            "isSuspicious": user_info["isSuspicious"]
-        }
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
 
-    def get_user_stat(self, response: dict, stat: str):
+    async def close(self):
+        """Close the underlying session and its pooled connections"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self):
+        if self._session is None:
+            raise RuntimeError("AsyncClient has no open session, use it as `async with AsyncClient(API_KEY) as client:`")
+        return self._session
+
+    async def search_player(self, platform: str, query: dict):
         """
-        Return the user statistic
+        Same as `Client.search_player()`, but awaitable
 
-        :param response: The dict returned by `get_player_stats()`
-        :param stat: The stat you are looking for (see the documentation for more informations)
+        :rtype: dict / int
+        """
 
-        :rtype: dict
+        async with self._get_session().get(self._search_url, params=query) as response:
+            status = response.status
+            return _loads(await response.read()) if 200 <= status < 300 else status
+
+    async def get_player_stats(self, platform: str, user_identifier: str):
+        """
+        Same as `Client.get_player_stats()`, but awaitable
+
+        :rtype: dict / int
         """
 
-        statistic = response["data"]["segments"][0]["stats"][stat]
-        return {
-            "rank": statistic["rank"],
-            "percentile": statistic["percentile"],
-            "displayName": statistic["displayName"],
-            "displayCategory": statistic["displayCategory"],
-            "category": statistic["category"],
-            "metadata": statistic["metadata"], # can contain extra data such as an image url
-            "value": statistic["value"],
-            "displayValue": statistic["displayValue"],
-            "displayType": statistic["displayType"]
-        }
+        async with self._get_session().get(self._profile_url_tpl.format(platform, quote(str(user_identifier), safe=""))) as response:
+            status = response.status
+            return _loads(await response.read()) if 200 <= status < 300 else status